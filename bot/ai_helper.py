@@ -4,13 +4,14 @@ This module provides functionality to generate AI responses for user questions
 using server-specific documentation as context and maintaining a unique personality.
 """
 import os
+import hashlib
 import logging
 from google import genai
 from google.genai import types
 from typing import Optional, List, Dict, Any
 import asyncio
 import time
-from collections import defaultdict, deque
+from collections import defaultdict, deque, OrderedDict
 
 from .database import get_all_server_documentation_content
 
@@ -62,6 +63,76 @@ Remember to stay in character while being genuinely helpful to users. Your respo
 # Template for general knowledge question responses
 GENERAL_KNOWLEDGE_REMINDER = "Um, I-I can help with that, though I should mention I'm primarily the server butler here! (^-^) But I'm happy to assist with general questions too!"
 
+# Simple heuristic for common general knowledge question starters
+GENERAL_KNOWLEDGE_PATTERNS = (
+    "what is", "what are", "who is", "who was", "when was", "when did",
+    "where is", "how do", "how does", "why is", "why are", "can you tell me about",
+    "explain", "define", "tell me about", "history of", "meaning of"
+)
+
+# Cache of recent AI responses keyed by a hash of the question and its context.
+# Repeated identical questions (the same user retrying, or several users asking
+# the same thing) can be answered in microseconds instead of a 1-3s Gemini call.
+# Structure: {cache_key: (response, timestamp)}
+_response_cache: OrderedDict[str, tuple] = OrderedDict()
+_RESPONSE_CACHE_TTL = 300  # seconds
+_RESPONSE_CACHE_MAX_SIZE = 128
+
+# Cache of the concatenated server documentation per guild. The documentation
+# is the largest repeated input to every AI request and changes rarely, so it
+# is kept in-process with a TTL instead of being refetched from the database
+# (and re-concatenated) on each question.
+# Structure: {guild_id: (documentation, timestamp)}
+_docs_cache: Dict[int, tuple] = {}
+_DOCS_CACHE_TTL = 300  # seconds
+
+def invalidate_documentation_cache(guild_id: int) -> None:
+    """
+    Drop the cached documentation for a guild.
+    Called when documentation is added, updated or removed.
+    """
+    _docs_cache.pop(guild_id, None)
+
+async def _get_documentation_cached(guild_id: int) -> str:
+    """
+    Get the concatenated server documentation for a guild, from cache if fresh.
+    """
+    entry = _docs_cache.get(guild_id)
+    if entry is not None and time.time() - entry[1] <= _DOCS_CACHE_TTL:
+        return entry[0]
+    documentation = await get_all_server_documentation_content(guild_id)
+    _docs_cache[guild_id] = (documentation, time.time())
+    return documentation
+
+def _response_cache_key(guild_id: int, user_name: str, user_question: str, server_documentation: str, is_general_knowledge: bool) -> str:
+    """
+    Build a cache key for an AI response from the inputs that determine it.
+    Message history is deliberately excluded so that repeats of the same
+    question still hit the cache while the documentation is unchanged. The
+    asker's name is included because it is embedded in the prompt and the
+    response often addresses them by name.
+    """
+    raw = f"{guild_id}|{is_general_knowledge}|{user_name}|{user_question}|{server_documentation}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def _get_cached_response(cache_key: str) -> Optional[str]:
+    """Return a cached response if present and not expired, else None."""
+    entry = _response_cache.get(cache_key)
+    if entry is None:
+        return None
+    response, timestamp = entry
+    if time.time() - timestamp > _RESPONSE_CACHE_TTL:
+        _response_cache.pop(cache_key, None)
+        return None
+    return response
+
+def _store_cached_response(cache_key: str, response: str) -> None:
+    """Store a response in the cache, evicting the oldest entry when full."""
+    _response_cache[cache_key] = (response, time.time())
+    _response_cache.move_to_end(cache_key)
+    while len(_response_cache) > _RESPONSE_CACHE_MAX_SIZE:
+        _response_cache.popitem(last=False)
+
 async def add_message_to_history(guild_id: int, channel_id: int, author_id: int, author_name: str, message_content: str):
     """
     Add a message to the channel history tracking.
@@ -120,13 +191,9 @@ async def generate_ai_response(guild_id: int, channel_id: int, user_id: int, use
         return "U-um, terribly sorry! AI help is currently unavailable because my connection to the Gemini API isn't configured properly. (・_・) Would you mind asking a human administrator about this?"
     
     try:
-        # Wrap the database call in a local function to ensure it runs in the current event loop
-        async def get_documentation():
-            return await get_all_server_documentation_content(guild_id)
-        
-        # Get server documentation with a timeout
+        # Get server documentation (cached per guild) with a timeout
         try:
-            server_documentation = await asyncio.wait_for(get_documentation(), timeout=10.0)
+            server_documentation = await asyncio.wait_for(_get_documentation_cached(guild_id), timeout=10.0)
         except asyncio.TimeoutError:
             logger.error(f"Timeout getting server documentation for guild {guild_id}")
             return "Oh! I-I'm terribly sorry, but I couldn't retrieve the server documentation. Um, perhaps try again later? Or maybe a human administrator could assist you? My apologies for the inconvenience! (>_<)"
@@ -136,7 +203,15 @@ async def generate_ai_response(guild_id: int, channel_id: int, user_id: int, use
         
         if not server_documentation:
             server_documentation = "No server documentation has been added yet."
-        
+
+        # Short-circuit with a cached response for repeated identical questions
+        cache_key = _response_cache_key(guild_id, user_name, user_question, server_documentation, is_general_knowledge)
+        cached_response = _get_cached_response(cache_key)
+        if cached_response is not None:
+            logger.debug(f"Returning cached AI response for guild {guild_id}")
+            await add_message_to_history(guild_id, channel_id, -1, "symm-bot", cached_response)
+            return cached_response
+
         # Get message history for context
         channel_history = get_channel_history(guild_id, channel_id)
         
@@ -202,9 +277,12 @@ async def generate_ai_response(guild_id: int, channel_id: int, user_id: int, use
         if full_response is None:
             return "Oh my goodness! I-I seem to have encountered an error while trying to generate a response. How embarrassing! (>_<) Please forgive me!"
         
+        # Cache the response so identical follow-up questions skip the API call
+        _store_cached_response(cache_key, full_response)
+
         # Add AI response to history too
         await add_message_to_history(guild_id, channel_id, -1, "symm-bot", full_response)
-        
+
         return full_response
         
     except Exception as e:
@@ -221,21 +299,16 @@ async def detect_general_knowledge_question(question: str) -> bool:
     Returns:
         True if it's likely a general knowledge question, False otherwise
     """
-    # Simple heuristic for common general knowledge question starters
-    general_knowledge_patterns = [
-        "what is", "what are", "who is", "who was", "when was", "when did", 
-        "where is", "how do", "how does", "why is", "why are", "can you tell me about",
-        "explain", "define", "tell me about", "history of", "meaning of"
-    ]
-    
     question_lower = question.lower()
-    
-    # Check if the question matches any of the general knowledge patterns
-    for pattern in general_knowledge_patterns:
-        if question_lower.startswith(pattern) or f" {pattern} " in question_lower:
-            # Exclude server-specific terms
-            if "server" in question_lower or "discord" in question_lower or "channel" in question_lower:
-                return False
-            return True
-    
-    return False 
\ No newline at end of file
+
+    # Server-specific terms always override the general-knowledge heuristic,
+    # so check them once up front instead of inside the pattern loop
+    if "server" in question_lower or "discord" in question_lower or "channel" in question_lower:
+        return False
+
+    # startswith accepts a tuple, testing every prefix in a single C-level call
+    if question_lower.startswith(GENERAL_KNOWLEDGE_PATTERNS):
+        return True
+
+    # Fall back to the slower mid-sentence scan only when no prefix matched
+    return any(f" {pattern} " in question_lower for pattern in GENERAL_KNOWLEDGE_PATTERNS) 
\ No newline at end of file
@@ -1,4 +1,5 @@
 import logging
+import re
 import disnake
 from disnake.ext import commands
 from .config import bot, OWNER_ID
@@ -11,10 +12,13 @@ from .database import (
     add_server_documentation, delete_server_documentation, get_server_documentation,
     safe_db_operation
 )
-from .ai_helper import generate_ai_response, detect_general_knowledge_question
+from .ai_helper import generate_ai_response, detect_general_knowledge_question, invalidate_documentation_cache
 
 logger = logging.getLogger(__name__)
 
+# Matches a role mention like <@&123456789> and captures the role ID
+_ROLE_MENTION_RE = re.compile(r"<@&(\d+)>")
+
 def setup_commands():
     """
     Register all slash commands with the bot.
@@ -274,41 +278,48 @@ async def cmd_create_role_menu(
     await inter.response.defer(ephemeral=True)
     
     try:
-        # Parse the roles parameter
+        # Parse the roles parameter, collecting warnings so they can be sent
+        # in a single followup message instead of one HTTP call per bad token
         role_groups = []
+        warnings = []
         for group in roles.split("|"):
             role_ids = []
             for role_str in group.strip().split():
                 try:
                     # Check if it's a role mention (<@&ROLE_ID>)
-                    if role_str.startswith("<@&") and role_str.endswith(">"):
-                        # Extract the role ID from the mention
-                        role_id_str = role_str[3:-1]  # Remove <@& and >
-                        try:
-                            role_id = int(role_id_str)
-                        except ValueError:
-                            await inter.followup.send(f"Warning: '{role_str}' contains an invalid role ID.", ephemeral=True)
-                            continue
+                    mention_match = _ROLE_MENTION_RE.fullmatch(role_str)
+                    if mention_match:
+                        role_id = int(mention_match.group(1))
+                    elif role_str.startswith("<@&"):
+                        # Looks like a mention but the ID part is malformed
+                        warnings.append(f"'{role_str}' contains an invalid role ID.")
+                        continue
                     else:
                         # Try to parse as a direct role ID
                         try:
                             role_id = int(role_str)
                         except ValueError:
-                            await inter.followup.send(f"Warning: '{role_str}' is not a valid role ID or mention.", ephemeral=True)
+                            warnings.append(f"'{role_str}' is not a valid role ID or mention.")
                             continue
-                    
+
                     # Verify the role exists
                     role = inter.guild.get_role(role_id)
                     if role:
                         role_ids.append(role_id)
                     else:
-                        await inter.followup.send(f"Warning: Role with ID {role_id} not found.", ephemeral=True)
+                        warnings.append(f"Role with ID {role_id} not found.")
                 except Exception as e:
                     logger.error(f"Error parsing role '{role_str}': {e}")
-                    await inter.followup.send(f"Warning: Error parsing '{role_str}'. Please use valid role mentions or IDs.", ephemeral=True)
+                    warnings.append(f"Error parsing '{role_str}'. Please use valid role mentions or IDs.")
             if role_ids:
                 role_groups.append(role_ids)
-        
+
+        if warnings:
+            await inter.followup.send(
+                "Warning:\n" + "\n".join(warnings),
+                ephemeral=True
+            )
+
         if not role_groups:
             await inter.followup.send("No valid roles were provided.", ephemeral=True)
             return
@@ -390,7 +401,7 @@ async def cmd_set_member_count_channel(
         channel_id = channel.id
         
         # Check if the bot has permissions to manage the channel
-        member = inter.guild.get_member(bot.user.id)
+        member = inter.guild.me
         permissions = channel.permissions_for(member)
         
         if not permissions.manage_channels:
@@ -436,7 +447,7 @@ async def cmd_set_notifications_channel(
         channel_id = channel.id
         
         # Check if the bot has permissions to send messages in the channel
-        member = inter.guild.get_member(bot.user.id)
+        member = inter.guild.me
         permissions = channel.permissions_for(member)
         
         if not permissions.send_messages:
@@ -501,7 +512,7 @@ async def cmd_set_new_user_roles(
             return
         
         # Check if the bot has permissions to manage roles
-        member = inter.guild.get_member(bot.user.id)
+        member = inter.guild.me
         permissions = inter.guild.permissions_for(member)
         
         if not permissions.manage_roles:
@@ -579,7 +590,7 @@ async def cmd_set_bot_roles(
             return
         
         # Check if the bot has permissions to manage roles
-        member = inter.guild.get_member(bot.user.id)
+        member = inter.guild.me
         permissions = inter.guild.permissions_for(member)
         
         if not permissions.manage_roles:
@@ -909,6 +920,8 @@ async def add_docs(
         )
         
         if doc_id:
+            # Make sure the AI helper picks up the new content immediately
+            invalidate_documentation_cache(guild_id)
             await inter.followup.send(
                 f"Server documentation '{title}' has been added/updated successfully. "
                 f"Users can now ask questions about this information using the `/help` command.",
@@ -940,6 +953,8 @@ async def remove_docs(
         success = await delete_server_documentation(guild_id, title)
         
         if success:
+            # Make sure the AI helper stops using the removed content
+            invalidate_documentation_cache(guild_id)
             await inter.followup.send(
                 f"Server documentation '{title}' has been removed successfully.",
                 ephemeral=True
@@ -1029,7 +1044,9 @@ async def view_docs(
         # Add metadata
         if doc["created_by"]:
             try:
-                created_by = await bot.fetch_user(doc["created_by"])
+                # Prefer the user cache; only fall back to the HTTP fetch
+                # when the author isn't cached
+                created_by = bot.get_user(doc["created_by"]) or await bot.fetch_user(doc["created_by"])
                 embed.set_footer(text=f"Created by: {created_by.display_name}")
             except:
                 embed.set_footer(text=f"Created by: Unknown (ID: {doc['created_by']})")
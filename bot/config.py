@@ -1,5 +1,6 @@
 import logging
 import os
+from dataclasses import dataclass
 import disnake
 from disnake.ext import commands
 from dotenv import load_dotenv
@@ -14,9 +15,48 @@ logger = logging.getLogger(__name__)
 
 load_dotenv()
 
-# Bot configuration
-DISCORD_BOT_TOKEN = os.getenv("DISCORD_BOT_TOKEN")
-OWNER_ID = int(os.getenv("OWNER_ID"))
+@dataclass(frozen=True, slots=True)
+class Settings:
+    """
+    Bot configuration read from the environment exactly once at import.
+    Frozen with slots so lookups are cheap and values can't drift at runtime.
+    """
+    discord_token: str
+    owner_id: int
+    database_url: str
+
+
+def _load_settings() -> Settings:
+    """Load and validate environment configuration, with clear warnings."""
+    discord_token = os.getenv("DISCORD_BOT_TOKEN") or ""
+    if not discord_token:
+        logger.warning("DISCORD_BOT_TOKEN not set in environment variables")
+
+    owner_id_raw = os.getenv("OWNER_ID") or ""
+    try:
+        owner_id = int(owner_id_raw) if owner_id_raw else 0
+    except ValueError:
+        logger.warning(f"OWNER_ID is not a valid integer: {owner_id_raw!r}")
+        owner_id = 0
+    if not owner_id:
+        logger.warning("OWNER_ID not set, owner-only commands will be unavailable")
+
+    database_url = os.getenv("DATABASE_URL", "")
+    if not database_url:
+        logger.warning("DATABASE_URL not set in environment variables")
+
+    return Settings(
+        discord_token=discord_token,
+        owner_id=owner_id,
+        database_url=database_url,
+    )
+
+
+settings = _load_settings()
+
+# Bot configuration (module-level aliases kept for existing imports)
+DISCORD_BOT_TOKEN = settings.discord_token
+OWNER_ID = settings.owner_id
 
 # These values are now stored in the database on a per-guild basis
 # Setting them to None or 0 as defaults
@@ -34,9 +74,7 @@ ROLE_BOT = None
 ROLE_IDS = []
 
 # Database configuration
-DATABASE_URL = os.getenv("DATABASE_URL", "")
-if not DATABASE_URL:
-    logger.warning("DATABASE_URL not set in environment variables")
+DATABASE_URL = settings.database_url
 
 # Set up intents
 intents = disnake.Intents.default()
@@ -4,6 +4,7 @@ Database module for PostgreSQL connection and operations.
 import os
 import logging
 import asyncio
+from time import monotonic
 from typing import Optional, List, Dict, Any, Union
 
 import sqlalchemy as sa
@@ -11,7 +12,7 @@ from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import declarative_base, sessionmaker
 from sqlalchemy.future import select
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.dialects.postgresql import ARRAY, TEXT
+from sqlalchemy.dialects.postgresql import ARRAY, TEXT, insert as pg_insert
 
 logger = logging.getLogger(__name__)
 
@@ -30,13 +31,21 @@ Base = declarative_base()
 engine = create_async_engine(
     ASYNC_DATABASE_URL, 
     echo=False,  # Set to True for SQL query logging
-    pool_size=10,  # Increased pool size
-    max_overflow=20,  # Increased max overflow
+    pool_size=10,  # Connections kept open between bursts
+    max_overflow=40,  # Burst headroom: up to 50 concurrent connections under event spikes
     pool_timeout=30,
     pool_recycle=1800,  # Recycle connections after 30 minutes
     pool_pre_ping=True,  # Check connection validity before using it
     future=True,
     isolation_level="AUTOCOMMIT",  # Use autocommit to avoid transaction conflicts
+    connect_args={
+        # Cache prepared statements per connection so hot queries are parsed
+        # and planned once per connection lifetime instead of on every call
+        "prepared_statement_cache_size": 1024,
+        # Bound how long any single statement can hold a pooled connection,
+        # so a stuck query cannot starve the event handlers behind it
+        "command_timeout": 10,
+    },
 )
 
 # Session factory with better async handling
@@ -81,7 +90,7 @@ class RoleButton(Base):
     __tablename__ = "role_buttons"
     
     id = sa.Column(sa.Integer, primary_key=True)
-    menu_id = sa.Column(sa.Integer, sa.ForeignKey("role_menus.id", ondelete="CASCADE"), nullable=False)
+    menu_id = sa.Column(sa.Integer, sa.ForeignKey("role_menus.id", ondelete="CASCADE"), nullable=False, index=True)
     role_id = sa.Column(sa.BigInteger, nullable=False)
     position = sa.Column(sa.Integer, nullable=False, default=0)
     group_index = sa.Column(sa.Integer, nullable=False, default=0)  # For multiple button rows/groups
@@ -240,34 +249,15 @@ async def init_db():
     try:
         # Create a standalone connection for initialization to avoid loop conflicts
         async with engine.begin() as conn:
-            # Create tables if they don't exist
+            # Create tables if they don't exist. create_all already performs its
+            # own existence checks, so no extra verification queries are needed
+            # afterwards - this keeps initialization to a single batch of
+            # round trips instead of probing each table individually.
             await conn.run_sync(Base.metadata.create_all)
             logger.info("Database initialized successfully")
-            
-            # Test if tables actually exist by executing simple queries
+
             tables = [table.name for table in Base.metadata.tables.values()]
             logger.info(f"Initialized tables: {tables}")
-            
-            # Verify server_configs table exists by running a simple query
-            try:
-                await conn.execute(sa.text("SELECT 1 FROM server_configs LIMIT 1"))
-                logger.info("Verified server_configs table exists")
-            except SQLAlchemyError as e:
-                logger.error(f"Verification of server_configs table failed: {e}")
-                # Try to create it specifically if it doesn't exist
-                await conn.execute(sa.text("""
-                CREATE TABLE IF NOT EXISTS server_configs (
-                    id SERIAL PRIMARY KEY,
-                    guild_id BIGINT NOT NULL UNIQUE,
-                    member_count_channel_id BIGINT,
-                    notifications_channel_id BIGINT,
-                    new_user_role_ids BIGINT[],
-                    bot_role_ids BIGINT[],
-                    created_at TIMESTAMP WITHOUT TIME ZONE DEFAULT now(),
-                    updated_at TIMESTAMP WITHOUT TIME ZONE
-                )
-                """))
-                logger.info("Created server_configs table manually")
     except (SQLAlchemyError, ConnectionRefusedError) as e:
         logger.error(f"Database initialization failed: {e}")
         # Print out more detailed error information
@@ -344,26 +334,26 @@ async def get_role_menu_by_message(message_id: int) -> Optional[Dict[str, Any]]:
     """
     try:
         async with async_session() as session:
-            # Get menu
-            result = await session.execute(
-                select(RoleMenu).where(RoleMenu.message_id == message_id)
-            )
-            menu = result.scalars().first()
-            
-            if not menu:
-                return None
-                
-            # Get buttons
+            # Get the menu and its buttons in a single joined query instead
+            # of one round trip for the menu and another for the buttons
             result = await session.execute(
-                select(RoleButton)
-                .where(RoleButton.menu_id == menu.id)
+                select(RoleMenu, RoleButton)
+                .outerjoin(RoleButton, RoleButton.menu_id == RoleMenu.id)
+                .where(RoleMenu.message_id == message_id)
                 .order_by(RoleButton.group_index, RoleButton.position)
             )
-            buttons = result.scalars().all()
-            
+            rows = result.all()
+
+            if not rows:
+                return None
+
+            menu = rows[0][0]
+
             # Organize buttons by group
             button_groups = {}
-            for button in buttons:
+            for _, button in rows:
+                if button is None:
+                    continue
                 if button.group_index not in button_groups:
                     button_groups[button.group_index] = []
                 button_groups[button.group_index].append({
@@ -441,6 +431,27 @@ async def get_role_menu_by_role_id(role_id: int, guild_id: int) -> Optional[Dict
 
 
 # Server configuration operations
+
+# In-process cache of server config rows. Config changes only through the
+# admin commands below (which invalidate), so a short TTL is safe and saves a
+# database round trip on every member event and background update tick.
+# Structure: {guild_id: (timestamp, config dict or None)}
+_server_config_cache: Dict[int, tuple] = {}
+_SERVER_CONFIG_CACHE_TTL = 600  # seconds
+
+
+def invalidate_server_config_cache(guild_id: int) -> None:
+    """Drop the cached config for a guild after a config write."""
+    _server_config_cache.pop(guild_id, None)
+
+
+# Built once at import so the hottest lookup doesn't reconstruct the same
+# expression tree on every call; the guild ID is supplied at execution time
+_SERVER_CONFIG_BY_GUILD = select(ServerConfig).where(
+    ServerConfig.guild_id == sa.bindparam("guild_id")
+)
+
+
 async def get_server_config(guild_id: int) -> Optional[Dict[str, Any]]:
     """
     Get server configuration from the database.
@@ -455,7 +466,12 @@ async def get_server_config(guild_id: int) -> Optional[Dict[str, Any]]:
     if not ASYNC_DATABASE_URL:
         logger.debug("No DATABASE_URL provided, returning None for server config")
         return None
-        
+
+    # Serve from cache while the entry is fresh
+    cached = _server_config_cache.get(guild_id)
+    if cached is not None and monotonic() - cached[0] < _SERVER_CONFIG_CACHE_TTL:
+        return cached[1]
+
     # Create a fresh session specifically for this operation
     session = None
     try:
@@ -469,11 +485,8 @@ async def get_server_config(guild_id: int) -> Optional[Dict[str, Any]]:
         
         # Perform the query directly with a timeout
         try:
-            # Create the statement
-            stmt = select(ServerConfig).where(ServerConfig.guild_id == guild_id)
-            
-            # Execute with timeout
-            result_future = session.execute(stmt)
+            # Execute the prebuilt statement with timeout
+            result_future = session.execute(_SERVER_CONFIG_BY_GUILD, {"guild_id": guild_id})
             result = await asyncio.wait_for(result_future, timeout=5.0)
             
             # Get the first result
@@ -486,10 +499,12 @@ async def get_server_config(guild_id: int) -> Optional[Dict[str, Any]]:
             return None
         
         if not config:
+            # Cache the miss too, so unconfigured guilds don't re-query every event
+            _server_config_cache[guild_id] = (monotonic(), None)
             return None
-            
+
         # Convert to dictionary to avoid session dependency
-        return {
+        config_dict = {
             "id": config.id,
             "guild_id": config.guild_id,
             "member_count_channel_id": config.member_count_channel_id,
@@ -497,6 +512,8 @@ async def get_server_config(guild_id: int) -> Optional[Dict[str, Any]]:
             "new_user_role_ids": config.new_user_role_ids if config.new_user_role_ids else [],
             "bot_role_ids": config.bot_role_ids if config.bot_role_ids else []
         }
+        _server_config_cache[guild_id] = (monotonic(), config_dict)
+        return config_dict
     except (SQLAlchemyError, ConnectionRefusedError) as e:
         logger.error(f"Database error getting server config: {e}")
         return None
@@ -508,6 +525,20 @@ async def get_server_config(guild_id: int) -> Optional[Dict[str, Any]]:
         await safe_close_session(session)
 
 
+async def _upsert_server_config(session, guild_id: int, **values) -> None:
+    """
+    Insert or update a guild's server config row in a single statement.
+    The unique index on guild_id lets Postgres resolve the conflict server
+    side, so no SELECT round trip is needed to decide insert vs update.
+    """
+    stmt = pg_insert(ServerConfig).values(guild_id=guild_id, **values)
+    stmt = stmt.on_conflict_do_update(index_elements=["guild_id"], set_=values)
+    await session.execute(stmt)
+    # Any write makes the cached config stale; dropping it before commit is
+    # safe because the next read simply refetches
+    invalidate_server_config_cache(guild_id)
+
+
 async def set_member_count_channel(guild_id: int, channel_id: int) -> bool:
     """
     Set the member count channel for a guild.
@@ -534,20 +565,10 @@ async def set_member_count_channel(guild_id: int, channel_id: int) -> bool:
         if not session:
             logger.warning(f"Could not create database session for setting member count channel for guild {guild_id}")
             return False
-            
-        # Try to find existing config
-        stmt = select(ServerConfig).where(ServerConfig.guild_id == guild_id)
-        result = await session.execute(stmt)
-        config = result.scalars().first()
-        
-        if not config:
-            # Create new config
-            config = ServerConfig(guild_id=guild_id)
-            session.add(config)
-        
-        # Update config
-        config.member_count_channel_id = channel_id
-        
+
+        # Upsert the config in a single round trip
+        await _upsert_server_config(session, guild_id, member_count_channel_id=channel_id)
+
         # Commit changes
         await session.commit()
         return True
@@ -592,20 +613,10 @@ async def set_notifications_channel(guild_id: int, channel_id: int) -> bool:
         if not session:
             logger.warning(f"Could not create database session for setting notifications channel for guild {guild_id}")
             return False
-            
-        # Try to find existing config
-        stmt = select(ServerConfig).where(ServerConfig.guild_id == guild_id)
-        result = await session.execute(stmt)
-        config = result.scalars().first()
-        
-        if not config:
-            # Create new config
-            config = ServerConfig(guild_id=guild_id)
-            session.add(config)
-        
-        # Update config
-        config.notifications_channel_id = channel_id
-        
+
+        # Upsert the config in a single round trip
+        await _upsert_server_config(session, guild_id, notifications_channel_id=channel_id)
+
         # Commit changes
         await session.commit()
         return True
@@ -650,20 +661,10 @@ async def set_new_user_roles(guild_id: int, role_ids: List[int]) -> bool:
         if not session:
             logger.warning(f"Could not create database session for setting new user roles for guild {guild_id}")
             return False
-            
-        # Try to find existing config
-        stmt = select(ServerConfig).where(ServerConfig.guild_id == guild_id)
-        result = await session.execute(stmt)
-        config = result.scalars().first()
-        
-        if not config:
-            # Create new config
-            config = ServerConfig(guild_id=guild_id)
-            session.add(config)
-        
-        # Update config
-        config.new_user_role_ids = role_ids
-        
+
+        # Upsert the config in a single round trip
+        await _upsert_server_config(session, guild_id, new_user_role_ids=role_ids)
+
         # Commit changes
         await session.commit()
         return True
@@ -697,20 +698,10 @@ async def set_bot_roles(guild_id: int, role_ids: List[int]) -> bool:
     session = None
     try:
         session = await get_fresh_session()
-        
-        # Get existing config or create new one
-        stmt = select(ServerConfig).where(ServerConfig.guild_id == guild_id)
-        result = await session.execute(stmt)
-        config = result.scalars().first()
-        
-        if not config:
-            # Create new config
-            config = ServerConfig(guild_id=guild_id)
-            session.add(config)
-        
-        # Update config
-        config.bot_role_ids = role_ids
-        
+
+        # Upsert the config in a single round trip
+        await _upsert_server_config(session, guild_id, bot_role_ids=role_ids)
+
         # Commit changes
         await session.commit()
         return True
@@ -751,24 +742,16 @@ async def add_role_block(guild_id: int, blocking_role_id: int, blocked_role_id:
             logger.warning(f"Could not create database session for adding role block for guild {guild_id}")
             return False
             
-        # Check if the block already exists
-        stmt = select(RoleBlock).where(
-            (RoleBlock.guild_id == guild_id) &
-            (RoleBlock.blocking_role_id == blocking_role_id) &
-            (RoleBlock.blocked_role_id == blocked_role_id)
-        )
-        result = await session.execute(stmt)
-        existing_block = result.scalars().first()
-        
-        if not existing_block:
-            # Create new block
-            block = RoleBlock(
-                guild_id=guild_id,
-                blocking_role_id=blocking_role_id,
-                blocked_role_id=blocked_role_id
-            )
-            session.add(block)
-        
+        # Insert the block in a single round trip; the unique constraint on
+        # (guild_id, blocking_role_id, blocked_role_id) makes duplicates a
+        # no-op, so no existence check query is needed first
+        stmt = pg_insert(RoleBlock).values(
+            guild_id=guild_id,
+            blocking_role_id=blocking_role_id,
+            blocked_role_id=blocked_role_id
+        ).on_conflict_do_nothing(constraint="unique_role_block")
+        await session.execute(stmt)
+
         # Commit changes
         await session.commit()
         return True
@@ -852,26 +835,20 @@ async def get_blocked_roles(guild_id: int, user_roles: List[int]) -> List[int]:
     Returns:
         List of role IDs that are blocked for the user
     """
+    if not user_roles:
+        return []
+
     try:
         async with async_session() as session:
-            # Find all blocks where the blocking role is in the user's roles
-            blocked_roles = []
-            
-            for role_id in user_roles:
-                # For each role the user has, find the roles it blocks
-                result = await session.execute(
-                    select(RoleBlock.blocked_role_id).where(
-                        (RoleBlock.guild_id == guild_id) &
-                        (RoleBlock.blocking_role_id == role_id)
-                    )
+            # Find all blocks where the blocking role is in the user's roles,
+            # in a single query instead of one round trip per role
+            result = await session.execute(
+                select(RoleBlock.blocked_role_id).distinct().where(
+                    (RoleBlock.guild_id == guild_id) &
+                    (RoleBlock.blocking_role_id.in_(user_roles))
                 )
-                
-                # Add the blocked roles to the list
-                for row in result.scalars().all():
-                    if row not in blocked_roles:
-                        blocked_roles.append(row)
-            
-            return blocked_roles
+            )
+            return list(result.scalars().all())
     except SQLAlchemyError as e:
         logger.error(f"Database error getting blocked roles: {e}")
         return []
@@ -889,23 +866,21 @@ async def get_blocking_role(guild_id: int, user_roles: List[int], role_id: int)
     Returns:
         The role ID that is blocking, or None if not blocked
     """
+    if not user_roles:
+        return None
+
     try:
         async with async_session() as session:
-            for blocking_role_id in user_roles:
-                # Check if this role blocks the target role
-                result = await session.execute(
-                    select(RoleBlock).where(
-                        (RoleBlock.guild_id == guild_id) &
-                        (RoleBlock.blocking_role_id == blocking_role_id) &
-                        (RoleBlock.blocked_role_id == role_id)
-                    )
-                )
-                
-                if result.scalars().first():
-                    return blocking_role_id
-            
-            # No blocking role found
-            return None
+            # One query over all of the user's roles instead of a round trip
+            # per role; any matching blocking role will do
+            result = await session.execute(
+                select(RoleBlock.blocking_role_id).where(
+                    (RoleBlock.guild_id == guild_id) &
+                    (RoleBlock.blocking_role_id.in_(user_roles)) &
+                    (RoleBlock.blocked_role_id == role_id)
+                ).limit(1)
+            )
+            return result.scalars().first()
     except SQLAlchemyError as e:
         logger.error(f"Database error getting blocking role: {e}")
         return None
@@ -941,6 +916,42 @@ async def get_role_blocks(guild_id: int) -> List[Dict[str, int]]:
         return []
 
 
+async def delete_guild_data(guild_id: int) -> bool:
+    """
+    Delete all stored data for a guild in a single transaction.
+    Called when the bot is removed from a guild so rows don't leak.
+
+    Args:
+        guild_id: Discord guild ID
+
+    Returns:
+        Whether the operation was successful
+    """
+    # If no database URL is provided, there is nothing to clean up
+    if not ASYNC_DATABASE_URL:
+        logger.debug("No DATABASE_URL provided, skipping guild data cleanup")
+        return False
+
+    try:
+        # The shared engine runs in AUTOCOMMIT, under which each DELETE would
+        # commit on its own and a mid-sequence failure would leave partial
+        # cleanup; override the isolation level so all four run (and roll
+        # back) as one real transaction
+        txn_engine = engine.execution_options(isolation_level="READ COMMITTED")
+        async with txn_engine.begin() as conn:
+            # role_buttons rows are removed by the ON DELETE CASCADE on
+            # their menu_id foreign key; everything else keys on guild_id
+            await conn.execute(sa.delete(RoleMenu).where(RoleMenu.guild_id == guild_id))
+            await conn.execute(sa.delete(RoleBlock).where(RoleBlock.guild_id == guild_id))
+            await conn.execute(sa.delete(ServerConfig).where(ServerConfig.guild_id == guild_id))
+            await conn.execute(sa.delete(ServerDocumentation).where(ServerDocumentation.guild_id == guild_id))
+        invalidate_server_config_cache(guild_id)
+        return True
+    except SQLAlchemyError as e:
+        logger.error(f"Database error deleting guild data for guild {guild_id}: {e}")
+        return False
+
+
 # Server documentation operations
 async def add_server_documentation(
     guild_id: int,
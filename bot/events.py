@@ -2,13 +2,20 @@ import asyncio
 import logging
 import disnake
 from .config import bot
-from .utils import update_member_count_channel, increment_member_count, decrement_member_count
+from .utils import (
+    update_member_count_channel, update_all_member_count_channels,
+    increment_member_count, decrement_member_count, clear_member_count_cache,
+)
 from .tasks import member_count_updater
-from .database import get_server_config
+from .database import get_server_config, delete_guild_data
 from .ai_helper import add_message_to_history, generate_ai_response, detect_general_knowledge_question
 
 logger = logging.getLogger(__name__)
 
+# on_ready fires again after every reconnect; this flag makes sure the full
+# member count initialization only runs once per process
+_member_counts_initialized = False
+
 def setup_events():
     """
     Register all event listeners with the bot.
@@ -21,14 +28,19 @@ async def on_ready():
     """
     Called when the bot is ready and connected to Discord.
     """
+    global _member_counts_initialized
+
     logger.info(f"Logged in as {bot.user} (ID: {bot.user.id})")
-    
-    # Initialize member counts for all guilds with a full refresh
-    # Use separate background task to avoid event loop issues
-    logger.info("Initializing member counts for all guilds")
-    
-    # Schedule the initialization in a background task
-    bot.loop.create_task(initialize_member_counts())
+
+    # Initialize member counts for all guilds with a full refresh, exactly
+    # once per process - reconnects re-fire on_ready but the cached counts
+    # survive, so re-running the full refresh would just repeat all the work
+    if not _member_counts_initialized:
+        _member_counts_initialized = True
+        logger.info("Initializing member counts for all guilds")
+
+        # Schedule the initialization in a background task
+        bot.loop.create_task(initialize_member_counts())
     
     # Start background task to update member count periodically
     if not hasattr(bot, 'member_count_task') or bot.member_count_task.done():
@@ -51,18 +63,24 @@ async def on_message(message: disnake.Message):
         # Process commands first
         await bot.process_commands(message)
         
-        # Add message to history for context tracking
-        await add_message_to_history(
-            message.guild.id if message.guild else 0,
-            message.channel.id,
-            message.author.id,
-            message.author.display_name,
-            message.content
-        )
+        # Add message to history for context tracking; messages with no text
+        # (embed-only, attachment-only, stickers) add nothing to AI context,
+        # so skip the append for them
+        if message.content:
+            await add_message_to_history(
+                message.guild.id if message.guild else 0,
+                message.channel.id,
+                message.author.id,
+                message.author.display_name,
+                message.content
+            )
         
-        # Check if the bot was mentioned or replied to
-        is_mentioned = bot.user in message.mentions
-        is_replied_to = message.reference and message.reference.resolved and message.reference.resolved.author.id == bot.user.id
+        # Check if the bot was mentioned or replied to, comparing plain IDs
+        # instead of going through model __eq__ dispatch per element
+        bot_user_id = bot.user.id
+        is_mentioned = any(user.id == bot_user_id for user in message.mentions)
+        reference = message.reference
+        is_replied_to = bool(reference and reference.resolved and reference.resolved.author.id == bot_user_id)
         
         if is_mentioned or is_replied_to:
             # Indicate that the bot is "typing"
@@ -114,20 +132,11 @@ async def initialize_member_counts():
     try:
         # Add a small delay to avoid initialization conflicts during startup
         await asyncio.sleep(2)
-        
-        for guild in bot.guilds:
-            try:
-                # Use gather with tasks that have been properly created
-                # This is more reliable than creating_task + wait_for pattern
-                logger.info(f"Initializing member count for guild {guild.name}")
-                
-                # Make sure we don't block the event loop for too long
-                await update_member_count_channel(guild, force_refresh=True)
-                
-                # Add a small delay between guilds to avoid rate limits
-                await asyncio.sleep(1)
-            except Exception as e:
-                logger.error(f"Error initializing member count for guild {guild.name}: {e}")
+
+        # Refresh all guilds concurrently; per-guild failures are logged by
+        # the helper and don't abort the sweep
+        logger.info(f"Initializing member counts for {len(bot.guilds)} guilds")
+        await update_all_member_count_channels(bot.guilds, force_refresh=True)
     except Exception as e:
         logger.error(f"Error in member count initialization: {e}", exc_info=True)
 
@@ -165,10 +174,10 @@ async def on_member_join(member: disnake.Member):
         if member.bot:
             # Handle bot joins
             logger.info(f"Bot {member.name} joined the server")
-            
+
             # Assign Bot roles if configured
+            roles_to_add = []
             if bot_role_ids:
-                roles_to_add = []
                 for role_id in bot_role_ids:
                     role = guild.get_role(role_id)
                     if role:
@@ -176,24 +185,30 @@ async def on_member_join(member: disnake.Member):
                         logger.info(f"Will assign {role.name} role to bot {member.name}")
                     else:
                         logger.error(f"Bot role with ID {role_id} not found in guild {guild.name}")
-                
-                if roles_to_add:
-                    await member.add_roles(*roles_to_add)
-                    logger.info(f"Assigned roles to bot {member.name} in {guild.name}")
-            
-            # Send notification message for bot joins
+
+            # Role assignment and the notification message are independent
+            # Discord calls, so run them concurrently instead of serializing
+            api_calls = []
+            if roles_to_add:
+                api_calls.append(member.add_roles(*roles_to_add))
             if notifications_channel_id:
                 notifications_channel = bot.get_channel(notifications_channel_id)
                 if notifications_channel:
-                    await notifications_channel.send(f"Bot {member.name} has joined the server.")
+                    api_calls.append(notifications_channel.send(f"Bot {member.name} has joined the server."))
                 else:
                     logger.error(f"Notifications channel with ID {notifications_channel_id} not found in guild {guild.name}")
-            
-            # Bots don't affect the human member count
+            if api_calls:
+                await asyncio.gather(*api_calls)
+                if roles_to_add:
+                    logger.info(f"Assigned roles to bot {member.name} in {guild.name}")
+
+            # Bots don't affect the human member count, but keep the cached
+            # bot counter accurate so fallback estimates stay in sync
+            increment_member_count(guild.id, is_bot=True)
         else:
             # Handle human user joins
             roles_to_add = []
-            
+
             # Get roles by IDs
             for role_id in new_user_role_ids:
                 role = guild.get_role(role_id)
@@ -202,28 +217,47 @@ async def on_member_join(member: disnake.Member):
                     logger.info(f"Will assign {role.name} role to {member.name}")
                 else:
                     logger.error(f"User role with ID {role_id} not found in guild {guild.name}")
-            
+
+            # Role assignment and the welcome message are independent
+            # Discord calls, so run them concurrently instead of serializing
+            api_calls = []
             if roles_to_add:
-                await member.add_roles(*roles_to_add)
-                logger.info(f"Assigned roles to {member.name} in {guild.name}")
-            
-            # Send welcome message for human users
+                api_calls.append(member.add_roles(*roles_to_add))
             if notifications_channel_id:
                 notifications_channel = bot.get_channel(notifications_channel_id)
                 if notifications_channel:
-                    await notifications_channel.send(f"Welcome to the server, {member.mention}!")
+                    api_calls.append(notifications_channel.send(f"Welcome to the server, {member.mention}!"))
                 else:
                     logger.error(f"Notifications channel with ID {notifications_channel_id} not found in guild {guild.name}")
-            
+            if api_calls:
+                await asyncio.gather(*api_calls)
+                if roles_to_add:
+                    logger.info(f"Assigned roles to {member.name} in {guild.name}")
+
             # Increment the human member count
             increment_member_count(guild.id)
-            
+
             # Update the member count channel in a background task to avoid blocking
             bot.loop.create_task(update_member_count_channel(guild, force_refresh=False))
 
     except Exception as e:
         logger.error(f"Error in on_member_join: {e}", exc_info=True)  # Log with traceback
 
+@bot.event
+async def on_guild_remove(guild: disnake.Guild):
+    """
+    Cleans up stored data when the bot is removed from a guild.
+
+    Args:
+        guild: The guild the bot was removed from
+    """
+    try:
+        logger.info(f"Removed from guild {guild.name} (ID: {guild.id}), cleaning up stored data")
+        clear_member_count_cache(guild.id)
+        await delete_guild_data(guild.id)
+    except Exception as e:
+        logger.error(f"Error in on_guild_remove: {e}", exc_info=True)
+
 @bot.event
 async def on_member_remove(member: disnake.Member):
     """
@@ -256,9 +290,8 @@ async def on_member_remove(member: disnake.Member):
             else:
                 logger.error(f"Notifications channel with ID {notifications_channel_id} not found in guild {guild.name}")
         
-        # If the member is not a bot, decrement the human member count
-        if not member.bot:
-            decrement_member_count(guild.id)
+        # Decrement the right counter depending on whether a bot or human left
+        decrement_member_count(guild.id, is_bot=member.bot)
         
         # Update the member count channel in a background task to avoid blocking
         bot.loop.create_task(update_member_count_channel(guild, force_refresh=False))
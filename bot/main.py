@@ -49,7 +49,10 @@ def register_shutdown_handlers():
     async def cleanup():
         """Clean up resources before shutdown."""
         logger.info("Shutting down bot...")
-        
+
+        # Wake background tasks so they exit promptly
+        tasks.signal_shutdown()
+
         # Close all database connections
         await database.cleanup_db()
         
@@ -1,12 +1,19 @@
 import asyncio
 import logging
-import time
 from asyncio import CancelledError
 from .config import bot
-from .utils import update_member_count_channel
+from .utils import update_all_member_count_channels
 
 logger = logging.getLogger(__name__)
 
+# Set during shutdown so sleeping background tasks wake immediately instead
+# of noticing on their next poll
+shutdown_event = asyncio.Event()
+
+def signal_shutdown() -> None:
+    """Wake background tasks so they exit promptly during shutdown."""
+    shutdown_event.set()
+
 async def member_count_updater():
     """
     Background task that updates the member count channel.
@@ -14,14 +21,17 @@ async def member_count_updater():
     - Full refresh every hour to ensure accuracy
     """
     await bot.wait_until_ready()
-    
-    # Keep track of the last full refresh
-    last_full_refresh = 0
-    
+
+    # Keep track of the last full refresh on the loop's monotonic clock, so
+    # NTP adjustments can't trigger (or suppress) a refresh; backdated so the
+    # first cycle always does a full refresh
+    loop = asyncio.get_running_loop()
+    last_full_refresh = loop.time() - 3600
+
     try:
         while not bot.is_closed():
             try:
-                current_time = time.time()
+                current_time = loop.time()
                 
                 # Determine if we need a full refresh (once per hour)
                 force_refresh = (current_time - last_full_refresh) >= 3600  # 1 hour in seconds
@@ -32,27 +42,9 @@ async def member_count_updater():
                 else:
                     logger.info("Running regular member count update")
                 
-                # Process each guild in sequence to avoid parallel database access
-                for guild in bot.guilds:
-                    try:
-                        # Check if bot is still running before processing each guild
-                        if bot.is_closed():
-                            logger.info("Bot is closing, stopping member count updater")
-                            return
-                        
-                        # Process the guild
-                        await update_member_count_channel(guild, force_refresh=force_refresh)
-                        
-                        # Small delay between processing each guild to prevent overload
-                        # This also helps ensure we're not keeping database connections open too long
-                        await asyncio.sleep(2)
-                    except asyncio.CancelledError:
-                        logger.info(f"Member count update for {guild.name} cancelled")
-                        raise  # Re-raise to handle at the task level
-                    except Exception as e:
-                        logger.error(f"Error updating member count for {guild.name}: {e}")
-                        # Continue with other guilds even if one fails
-                        continue
+                # Process guilds concurrently so the cycle takes ~max guild
+                # latency instead of the sum of them
+                await update_all_member_count_channels(bot.guilds, force_refresh=force_refresh)
                 
             except CancelledError:
                 logger.info("Member count updater task cancelled")
@@ -60,14 +52,15 @@ async def member_count_updater():
             except Exception as e:
                 logger.error(f"Error in member count updater task: {e}", exc_info=True)
             
-            # Wait 15 minutes before the next update
+            # Wait 15 minutes before the next update, waking immediately if
+            # shutdown is signalled instead of polling every minute
             try:
-                # Check every minute if the bot is still running
-                for _ in range(15):  # 15 minutes = 15 iterations of 1 minute
-                    if bot.is_closed():
-                        logger.info("Bot is closing, stopping member count updater")
-                        return
-                    await asyncio.sleep(60)  # Sleep for 1 minute
+                await asyncio.wait_for(shutdown_event.wait(), timeout=900)
+                logger.info("Bot is closing, stopping member count updater")
+                return
+            except asyncio.TimeoutError:
+                # Normal cycle boundary; run the next update
+                pass
             except CancelledError:
                 logger.info("Member count updater task sleep cancelled")
                 break
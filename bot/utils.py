@@ -5,24 +5,79 @@ particularly focused on member count handling and role management.
 """
 import asyncio
 import logging
+from time import monotonic
 import disnake
 from .config import bot
 from .database import get_server_config
 
 logger = logging.getLogger(__name__)
 
-# Dictionary to store human member counts per guild
-# Format: {guild_id: {"human_count": count, "last_verified": timestamp}}
+class MemberCountEntry:
+    """Cached member counts for one guild. Slotted since the bot keeps one
+    of these per guild for the lifetime of the process."""
+    __slots__ = ("human_count", "bot_count", "last_verified")
+
+    def __init__(self, human_count: int, bot_count: int, last_verified: float):
+        self.human_count = human_count
+        self.bot_count = bot_count
+        self.last_verified = last_verified
+
+# Dictionary to store member counts per guild
+# Format: {guild_id: MemberCountEntry}
 member_counts = {}
 
-async def get_roles_by_ids(guild: disnake.Guild, role_ids: list[int]) -> list[disnake.Role]:
+# How long a cached member count stays valid before the next read triggers a
+# full recount; incremental join/leave updates keep it accurate in between
+MEMBER_COUNT_TTL = 600  # 10 minutes
+
+# Last count successfully written to each guild's channel name, so steady-state
+# updates (no joins/leaves since the last write) can skip the edit path
+# Format: {guild_id: count}
+_last_set_counts = {}
+
+# Per-guild locks so concurrent update calls (join/leave bursts) coalesce
+# into one in-flight refresh instead of queueing duplicate work
+# Format: {guild_id: asyncio.Lock}
+_update_locks = {}
+
+# When each guild's channel was last updated, used to debounce non-forced
+# updates; Discord only allows 2 channel name edits per 10 minutes anyway
+# Format: {guild_id: timestamp}
+_last_edit_times = {}
+
+# Minimum seconds between non-forced channel updates per guild
+MEMBER_COUNT_EDIT_DEBOUNCE = 300  # 5 minutes
+
+# Guilds where the manage_channels check on the member count channel last
+# passed, so steady-state updates skip recomputing the permission bitfield.
+# Only positive results are cached (missing permissions are recomputed each
+# call so newly granted access is noticed), and an entry is dropped if
+# Discord rejects an edit anyway.
+# Format: {guild_id: channel_id}
+_manage_perms_ok = {}
+
+def clear_member_count_cache(guild_id: int) -> None:
+    """
+    Drop all cached member count state for a guild.
+    Called when the bot is removed from a guild.
+
+    Args:
+        guild_id: The ID of the guild to clear cached counts for
+    """
+    member_counts.pop(guild_id, None)
+    _last_set_counts.pop(guild_id, None)
+    _update_locks.pop(guild_id, None)
+    _last_edit_times.pop(guild_id, None)
+    _manage_perms_ok.pop(guild_id, None)
+
+def get_roles_by_ids(guild: disnake.Guild, role_ids: list[int]) -> list[disnake.Role]:
     """
     Get a list of role objects from a list of role IDs.
-    
+
     Args:
         guild: The guild to get roles from
         role_ids: List of role IDs to fetch
-        
+
     Returns:
         List of role objects
     """
@@ -32,7 +87,7 @@ async def get_roles_by_ids(guild: disnake.Guild, role_ids: list[int]) -> list[di
         if role:
             roles.append(role)
         else:
-            logger.error(f"Role with ID {role_id} not found in guild {guild.name}")
+            logger.error("Role with ID %d not found in guild %s", role_id, guild.name)
     return roles
 
 async def get_human_member_count(guild: disnake.Guild, force_refresh: bool = False) -> int:
@@ -47,19 +102,35 @@ async def get_human_member_count(guild: disnake.Guild, force_refresh: bool = Fal
         The number of human members in the guild
     """
     guild_id = guild.id
-    
-    # If we need to force a refresh or don't have a count for this guild yet
-    if force_refresh or guild_id not in member_counts:
+
+    # Refresh when forced, when we have no cached count yet, or when the
+    # cached count has outlived its TTL since it was last verified
+    cached = member_counts.get(guild_id)
+    cache_expired = cached is None or (monotonic() - cached.last_verified) >= MEMBER_COUNT_TTL
+    if force_refresh or cache_expired:
         try:
-            # Try to get the most up-to-date member list
-            await guild.chunk()  # Ensure all members are cached
-            human_count = sum(1 for member in guild.members if not member.bot)
-            logger.info(f"Counted {human_count} human members out of {guild.member_count} total members in {guild.name}")
-            
+            # Ensure all members are cached; skip the Gateway roundtrip when
+            # the guild is already fully chunked, or when the member cache
+            # already holds every member (small guilds arrive complete in the
+            # GUILD_CREATE payload without ever setting chunked)
+            if not (guild.chunked or len(guild._members) == guild.member_count):
+                await guild.chunk()
+
+            # Count humans and bots in a single pass over the member cache;
+            # guild._members is the underlying dict, avoiding the list copy
+            # the guild.members property makes on every access
+            human_count = 0
+            bot_count = 0
+            for member in guild._members.values():
+                if member.bot:
+                    bot_count += 1
+                else:
+                    human_count += 1
+            logger.info("Counted %d human members out of %d total members in %s", human_count, guild.member_count, guild.name)
+
             # Save the count to our cache
-            from time import time
-            member_counts[guild_id] = {"human_count": human_count, "last_verified": time()}
-            
+            member_counts[guild_id] = MemberCountEntry(human_count, bot_count, monotonic())
+
             return human_count
             
         except Exception as e:
@@ -69,161 +140,221 @@ async def get_human_member_count(guild: disnake.Guild, force_refresh: bool = Fal
                 # Fallback to approximate count and estimate
                 updated_guild = await bot.fetch_guild(guild.id, with_counts=True)
                 # We can't get exact bot count in this case, so we might need to estimate
-                # Let's assume current bot ratio is similar to what we have in cache
+                # Let's assume current bot ratio is similar to what we have in cache,
+                # preferring the maintained counters over rescanning guild.members
+                bot_count = cached.bot_count if cached else sum(1 for m in guild._members.values() if m.bot)
                 if guild.member_count > 0:
-                    cached_bot_ratio = sum(1 for m in guild.members if m.bot) / len(guild.members)
+                    cached_bot_ratio = bot_count / max(len(guild._members), 1)
                     estimated_bot_count = updated_guild.approximate_member_count * cached_bot_ratio
                     human_count = int(updated_guild.approximate_member_count - estimated_bot_count)
                 else:
                     # If we have no cached members, just use the approximate count
                     human_count = updated_guild.approximate_member_count
-                logger.info(f"Estimated {human_count} human members in {guild.name} using approximate count")
-                
+                logger.info("Estimated %d human members in %s using approximate count", human_count, guild.name)
+
                 # Save the count to our cache
-                from time import time
-                member_counts[guild_id] = {"human_count": human_count, "last_verified": time()}
-                
+                member_counts[guild_id] = MemberCountEntry(human_count, bot_count, monotonic())
+
                 return human_count
-                
+
             except Exception as e2:
-                # If all else fails, just use the cached members and filter bots
+                # If all else fails, just use the cached members and count in one pass
                 logger.warning(f"Could not fetch updated guild info: {e2}, using cached members only")
-                human_count = sum(1 for member in guild.members if not member.bot)
-                
+                human_count = 0
+                bot_count = 0
+                for member in guild._members.values():
+                    if member.bot:
+                        bot_count += 1
+                    else:
+                        human_count += 1
+
                 # Save the count to our cache
-                from time import time
-                member_counts[guild_id] = {"human_count": human_count, "last_verified": time()}
-                
+                member_counts[guild_id] = MemberCountEntry(human_count, bot_count, monotonic())
+
                 return human_count
-    
+
     # If we already have a count, just return it
-    return member_counts[guild_id]["human_count"]
+    return cached.human_count
 
-def increment_member_count(guild_id: int) -> None:
+def increment_member_count(guild_id: int, is_bot: bool = False) -> None:
     """
-    Increment the human member count for a guild by 1.
-    
+    Increment the member count for a guild by 1.
+
     Args:
         guild_id: The ID of the guild to increment the count for
+        is_bot: Whether the member who joined is a bot
     """
-    if guild_id in member_counts:
-        member_counts[guild_id]["human_count"] += 1
-        logger.info(f"Incremented human member count for guild {guild_id} to {member_counts[guild_id]['human_count']}")
+    entry = member_counts.get(guild_id)
+    if entry:
+        if is_bot:
+            entry.bot_count += 1
+            logger.info("Incremented bot count for guild %d to %d", guild_id, entry.bot_count)
+        else:
+            entry.human_count += 1
+            logger.info("Incremented human member count for guild %d to %d", guild_id, entry.human_count)
     # If we don't have a count yet, we'll initialize it on the next update
 
-def decrement_member_count(guild_id: int) -> None:
+def decrement_member_count(guild_id: int, is_bot: bool = False) -> None:
     """
-    Decrement the human member count for a guild by 1.
-    
+    Decrement the member count for a guild by 1.
+
     Args:
         guild_id: The ID of the guild to decrement the count for
+        is_bot: Whether the member who left is a bot
     """
-    if guild_id in member_counts:
-        member_counts[guild_id]["human_count"] -= 1
-        logger.info(f"Decremented human member count for guild {guild_id} to {member_counts[guild_id]['human_count']}")
+    entry = member_counts.get(guild_id)
+    if entry:
+        if is_bot:
+            entry.bot_count -= 1
+            logger.info("Decremented bot count for guild %d to %d", guild_id, entry.bot_count)
+        else:
+            entry.human_count -= 1
+            logger.info("Decremented human member count for guild %d to %d", guild_id, entry.human_count)
     # If we don't have a count yet, we'll initialize it on the next update
 
 async def update_member_count_channel(guild: disnake.Guild, force_refresh: bool = False) -> bool:
     """
     Updates the member count channel name to show the total number of human members in the server.
     Excludes bots from the count.
-    
+
+    Concurrent calls for the same guild coalesce onto the update already in
+    flight, and non-forced calls within the debounce window are skipped —
+    the cached counters stay authoritative and the next periodic update
+    picks up the change.
+
     Args:
         guild: The guild to update the member count channel for
         force_refresh: Whether to force a full count refresh even if we have cached data
-        
+
     Returns:
-        True if the update was successful, False otherwise
+        True if the update was successful (or coalesced/debounced), False otherwise
     """
-    try:
-        # Check if event loop is closed
-        try:
-            loop = asyncio.get_running_loop()
-            if loop.is_closed():
-                logger.warning(f"Event loop is closed when updating member count for guild {guild.name}")
-                return False
-        except RuntimeError:
-            # No event loop running
-            logger.warning(f"No event loop running when updating member count for guild {guild.name}")
-            return False
-        
-        # Get the member count channel ID from the database
-        server_config = None
-        member_count_channel_id = None
-        
-        try:
-            # Use a local task for database operations to ensure it uses the current event loop
-            async def get_config():
-                return await get_server_config(guild.id)
-                
-            # Get the server config with a timeout
-            server_config = await asyncio.wait_for(get_config(), timeout=10.0)
-            
-            if server_config:
-                member_count_channel_id = server_config.get("member_count_channel_id")
-        except asyncio.TimeoutError:
-            logger.error(f"Timeout getting server config for guild {guild.id}")
-            return False
-        except Exception as db_error:
-            logger.error(f"Error getting server config for guild {guild.id}: {db_error}")
-            return False
-        
-        # If we don't have a channel ID, log and return
-        if not member_count_channel_id:
-            logger.debug(f"No member count channel configured for guild {guild.name}")
-            return False
-        
-        channel = guild.get_channel(member_count_channel_id)
-        if not channel:
-            logger.error(f"Member count channel with ID {member_count_channel_id} not found in guild {guild.name}")
-            return False
-        
-        # Get the human member count with a timeout
-        try:
-            # Use a local task for member count to ensure it uses the current event loop
-            async def count_members():
-                return await get_human_member_count(guild, force_refresh)
-                
-            human_count = await asyncio.wait_for(count_members(), timeout=10.0)
-        except asyncio.TimeoutError:
-            logger.error(f"Timeout getting human member count for guild {guild.name}")
-            return False
-        except Exception as e:
-            logger.error(f"Error getting human member count for guild {guild.name}: {e}")
-            return False
-        
-        # Ensure the bot has the permissions to update the channel
-        bot_member = guild.get_member(bot.user.id)
-        if not bot_member:
-            logger.error(f"Bot member not found in guild {guild.name}")
-            return False
-            
-        permissions = channel.permissions_for(bot_member)
-        if not permissions.manage_channels:
-            logger.warning(f"Bot doesn't have permission to manage channels in {guild.name}")
-            return False
-            
-        # Update the channel name
-        new_name = f"Members: {human_count}"
-        
-        if channel.name != new_name:
+    gid = guild.id
+    lock = _update_locks.setdefault(gid, asyncio.Lock())
+    if lock.locked():
+        # Another update for this guild is already running; its result will
+        # reflect the same cached counters ours would
+        logger.debug(f"Member count update already in flight for {guild.name}, coalescing")
+        return True
+
+    async with lock:
+        # Drop non-forced updates that arrive shortly after an edit; Discord
+        # rate-limits channel name edits to 2 per 10 minutes regardless
+        if not force_refresh and (monotonic() - _last_edit_times.get(gid, 0.0)) < MEMBER_COUNT_EDIT_DEBOUNCE:
+            logger.debug(f"Member count channel for {guild.name} edited recently, debouncing")
+            return True
+        return await _update_member_count_channel(guild, force_refresh)
+
+async def update_all_member_count_channels(guilds, force_refresh: bool = False, concurrency: int = 10) -> None:
+    """
+    Update the member count channels of many guilds concurrently.
+
+    Guilds are processed in parallel up to the concurrency bound, so a full
+    sweep takes roughly the slowest guild's latency instead of the sum of
+    all of them. Failures are logged per guild and never abort the sweep.
+
+    Args:
+        guilds: The guilds to update
+        force_refresh: Whether to force a full count refresh for each guild
+        concurrency: Maximum number of guilds processed at once
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def update_one(guild):
+        async with semaphore:
             try:
-                # Use a local task for channel edit to ensure it uses the current event loop
-                async def edit_channel():
-                    await channel.edit(name=new_name)
-                    
-                await asyncio.wait_for(edit_channel(), timeout=10.0)
-                logger.info(f"Updated member count channel in {guild.name} to '{new_name}'")
-                return True
+                async with asyncio.timeout(30):
+                    await update_member_count_channel(guild, force_refresh=force_refresh)
             except asyncio.TimeoutError:
-                logger.error(f"Timeout updating member count channel in {guild.name}")
+                logger.error(f"Timeout updating member count for {guild.name}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error updating member count for {guild.name}: {e}")
+
+    await asyncio.gather(*(update_one(guild) for guild in guilds), return_exceptions=True)
+
+async def _update_member_count_channel(guild: disnake.Guild, force_refresh: bool) -> bool:
+    """Performs the config lookup, member count, and channel edit for a guild,
+    under one overall time budget instead of a timeout per step."""
+    # Bind the guild name and ID once; every log line below references them
+    # and LOAD_FAST beats repeated property dispatch
+    gn = guild.name
+    gid = guild.id
+    try:
+        async with asyncio.timeout(15):
+            # Get the member count channel ID from the database
+            member_count_channel_id = None
+            try:
+                server_config = await get_server_config(gid)
+                if server_config:
+                    member_count_channel_id = server_config.get("member_count_channel_id")
+            except Exception as db_error:
+                logger.error(f"Error getting server config for guild {gid}: {db_error}")
+                return False
+
+            # If we don't have a channel ID, log and return
+            if not member_count_channel_id:
+                logger.debug(f"No member count channel configured for guild {gn}")
                 return False
+
+            channel = guild.get_channel(member_count_channel_id)
+            if not channel:
+                logger.error(f"Member count channel with ID {member_count_channel_id} not found in guild {gn}")
+                return False
+
+            # Get the human member count
+            try:
+                human_count = await get_human_member_count(guild, force_refresh)
             except Exception as e:
-                logger.error(f"Error updating member count channel in {guild.name}: {e}")
+                logger.error(f"Error getting human member count for guild {gn}: {e}")
                 return False
-        else:
-            logger.info(f"Member count channel in {guild.name} already up to date: '{new_name}'")
-            return True
+
+            # Skip the rest of the update when the count we last wrote to the
+            # channel is unchanged; the edit would be a no-op anyway
+            if not force_refresh and _last_set_counts.get(gid) == human_count:
+                logger.debug(f"Member count for {gn} unchanged at {human_count}, skipping update")
+                return True
+
+            # Ensure the bot has the permissions to update the channel
+            bot_member = guild.me
+            if not bot_member:
+                logger.error(f"Bot member not found in guild {gn}")
+                return False
+
+            # permissions_for walks the bot's roles and ORs their bitfields on
+            # every call; reuse the last positive result for the same channel
+            if _manage_perms_ok.get(gid) != channel.id:
+                if not channel.permissions_for(bot_member).manage_channels:
+                    logger.warning(f"Bot doesn't have permission to manage channels in {gn}")
+                    return False
+                _manage_perms_ok[gid] = channel.id
+
+            # Update the channel name
+            new_name = f"Members: {human_count}"
+
+            if channel.name != new_name:
+                try:
+                    await channel.edit(name=new_name)
+                    _last_set_counts[gid] = human_count
+                    _last_edit_times[gid] = monotonic()
+                    logger.info(f"Updated member count channel in {gn} to '{new_name}'")
+                    return True
+                except disnake.Forbidden as e:
+                    # Our cached permission result was stale; recompute next call
+                    _manage_perms_ok.pop(gid, None)
+                    logger.error(f"Forbidden from editing member count channel in {gn}: {e}")
+                    return False
+                except Exception as e:
+                    logger.error(f"Error updating member count channel in {gn}: {e}")
+                    return False
+            else:
+                _last_set_counts[gid] = human_count
+                logger.info(f"Member count channel in {gn} already up to date: '{new_name}'")
+                return True
+    except asyncio.TimeoutError:
+        logger.error(f"Timeout updating member count channel for {gn}")
+        return False
     except Exception as e:
-        logger.error(f"Unexpected error in update_member_count_channel for {guild.name}: {e}", exc_info=True)
+        logger.error(f"Unexpected error in update_member_count_channel for {gn}: {e}", exc_info=True)
         return False 
\ No newline at end of file